@@ -1,13 +1,48 @@
-from fastapi import FastAPI, UploadFile, Form
+from fastapi import FastAPI, UploadFile, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
-import os, time, requests, cloudinary, cloudinary.uploader
-import openai
+from contextlib import asynccontextmanager
+from collections import OrderedDict
+from typing import Optional
+try:
+    import python_multipart as multipart
+    from python_multipart.multipart import parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    import multipart
+    from multipart.multipart import parse_options_header
+import os, re, json, time, hashlib, logging, random, asyncio, tempfile, weakref, uuid, httpx, cloudinary, cloudinary.api, cloudinary.uploader
 
 # ------------------- SETUP -------------------
 load_dotenv()
 
-app = FastAPI()
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Shared async HTTP client - reuses pooled keep-alive connections across all API calls.
+# keepalive_expiry must outlive the longest poll wait (30s) or every poll pays a new TLS handshake.
+http_client = httpx.AsyncClient(
+    timeout=60,
+    follow_redirects=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60)
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Cancel in-flight pipeline jobs before closing the client they depend on
+    running = list(_job_tasks)
+    for task in running:
+        task.cancel()
+    await asyncio.gather(*running, return_exceptions=True)
+    await http_client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -24,53 +59,589 @@ API_SECRET = os.getenv("API_SECRET")
 TWELVELABS_API_KEY = os.getenv("TWELVELABS_API_KEY")
 TWELVELABS_INDEX_ID = os.getenv("TWELVELABS_INDEX_ID")
 TWELVELABS_API_URL = "https://api.twelvelabs.io/v1.3"
+TWELVELABS_INDEX_NAME = "hackathon_index"
+TWELVELABS_INDEX_NOT_FOUND = "index_not_exists"  # API error code for an unknown index_id
+# Auto-created index id is remembered here so restarts don't create a new one
+TWELVELABS_INDEX_CACHE = os.getenv(
+    "TWELVELABS_INDEX_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".twelvelabs_index.json")
+)
 
 HIGGSFIELD_API_KEY = os.getenv("HIGGSFIELD_API_KEY")
+HIGGSFIELD_API_SECRET = os.getenv("HIGGSFIELD_API_SECRET")
+HIGGSFIELD_API_URL = "https://platform.higgsfield.ai"
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
-openai.api_key = OPENAI_API_KEY
+OPENAI_MODEL = "gpt-4o-mini"
+OPENAI_MAX_TOKENS = 250
+GPT_MAX_DESCRIPTION_CHARS = 4000  # long TwelveLabs descriptions are trimmed before prompting
+GPT_CACHE_SIZE = 1024
 
 # Cloudinary setup
 cloudinary.config(cloud_name=CLOUD_NAME, api_key=API_KEY, api_secret=API_SECRET)
+CLOUDINARY_CHUNK_SIZE = 6_000_000  # chunk size for upload_large (videos)
+
+# Settings the /process_ai/ pipeline can't run without
+REQUIRED_SETTINGS = {
+    "CLOUD_NAME": CLOUD_NAME,
+    "API_KEY": API_KEY,
+    "API_SECRET": API_SECRET,
+    "TWELVELABS_API_KEY": TWELVELABS_API_KEY,
+    "OPENAI_API_KEY": OPENAI_API_KEY,
+    "HIGGSFIELD_API_KEY": HIGGSFIELD_API_KEY,
+    "HIGGSFIELD_API_SECRET": HIGGSFIELD_API_SECRET,
+}
+
+# Multipart file fields streamed to Cloudinary -> resource_type
+UPLOAD_FIELDS = {"video": "video", "image": "image"}
+MAX_TEXT_FIELD_BYTES = 1_000_000
+SHA256_RE = re.compile(r"[0-9a-f]{64}")
+
+
+# Public URL of this backend; when set, TwelveLabs/Higgsfield are asked to call
+# /webhook/... on completion so we don't have to wait out the poll interval
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL")
+
+# Status polling backoff (seconds)
+POLL_BASE_DELAY = 2
+POLL_MAX_DELAY = 15
+# Higgsfield jobs often finish quickly, then take minutes - poll fast early, then back off
+HIGGSFIELD_POLL_INTERVALS = (2, 2, 3, 5, 5, 10, 10, 15, 15, 30)
+HIGGSFIELD_TIMEOUT = 1200
 
 
 # ------------------- HELPERS -------------------
 
-def create_index_if_needed():
-    """Auto-create a TwelveLabs index if none exists."""
+def poll_delay(attempt: int, resp: httpx.Response = None, intervals: tuple = None) -> float:
+    """Delay before the next status poll, with jitter; honors Retry-After on 429/5xx responses.
+
+    Exponential backoff by default, or follows `intervals` (the last value repeats) when given.
+    """
+    if resp is not None and (resp.status_code == 429 or resp.status_code >= 500):
+        retry_after = resp.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+    if intervals:
+        return intervals[min(attempt, len(intervals) - 1)] + random.uniform(0, 0.5)
+    return min(POLL_MAX_DELAY, POLL_BASE_DELAY * (1.5 ** attempt)) + random.uniform(0, 0.5)
+
+
+_cached_index_id: Optional[str] = None
+_index_lock = asyncio.Lock()
+
+
+# TwelveLabs task states that mean "keep polling" - these are read without a full JSON parse
+TASK_PENDING_STATUSES = ("queued", "pending", "validating", "uploading", "indexing")
+_STATUS_RE = re.compile(rb'"status"\s*:\s*"([^"]+)"')
+
+
+def peek_status(content: bytes):
+    """Cheaply read the "status" value from a JSON body without parsing it.
+
+    Only trusted when the body has a single "status" key; with nested ones we can't tell which
+    is top-level, so return None and let the caller do a full parse.
+    """
+    matches = _STATUS_RE.findall(content)
+    return matches[0].decode() if len(matches) == 1 else None
+
+
+# Provider task/job id -> Event set by its webhook; entries vanish once the poller is done
+_webhook_events = weakref.WeakValueDictionary()
+
+
+def webhook_url(provider: str):
+    """Callback URL for a provider, or None when PUBLIC_BASE_URL isn't configured."""
+    if not PUBLIC_BASE_URL:
+        return None
+    return f"{PUBLIC_BASE_URL.rstrip('/')}/webhook/{provider}"
+
+
+def watch_webhook(task_id: str) -> asyncio.Event:
+    """Register interest in webhook callbacks for a provider task/job id."""
+    event = asyncio.Event()
+    _webhook_events[task_id] = event
+    return event
+
+
+async def wait_for_webhook(event: asyncio.Event, timeout: float):
+    """Sleep up to `timeout` seconds, waking early if the provider's webhook fires."""
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    event.clear()
+
+
+def api_key_fingerprint(api_key: str) -> str:
+    """Short, non-reversible tag tying a cached index id to the API key that created it."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+def load_cached_index_id():
+    """Read a previously auto-created index id from disk, if it belongs to the current API key."""
+    try:
+        with open(TWELVELABS_INDEX_CACHE) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("key_fingerprint") != api_key_fingerprint(TWELVELABS_API_KEY):
+        return None
+    return cached.get("index_id")
+
+
+def save_cached_index_id(index_id: str):
+    """Persist the auto-created index id so it survives restarts."""
+    try:
+        with open(TWELVELABS_INDEX_CACHE, "w") as f:
+            json.dump({"index_id": index_id, "key_fingerprint": api_key_fingerprint(TWELVELABS_API_KEY)}, f)
+    except OSError as e:
+        logger.warning("Could not persist TwelveLabs index id: %s", e)
+
+
+def forget_cached_index_id(index_id: str):
+    """Drop a cached index id TwelveLabs no longer recognises, so the next request creates a new one."""
+    global _cached_index_id
+
+    if index_id != _cached_index_id and index_id != load_cached_index_id():
+        return  # configured via TWELVELABS_INDEX_ID, or already replaced
+    logger.warning("TwelveLabs doesn't know index %s, discarding cached id", index_id)
+    _cached_index_id = None
+    try:
+        os.remove(TWELVELABS_INDEX_CACHE)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning("Could not remove TwelveLabs index cache: %s", e)
+
+
+def is_unknown_index_error(status_code: int, result) -> bool:
+    """Whether TwelveLabs rejected a task because the index doesn't exist (deleted, or another account)."""
+    return status_code == 404 and isinstance(result, dict) and result.get("code") == TWELVELABS_INDEX_NOT_FOUND
+
+
+async def find_index_by_name(headers: dict):
+    """Id of an existing TwelveLabs index named TWELVELABS_INDEX_NAME, or None."""
+    try:
+        res = await http_client.get(
+            f"{TWELVELABS_API_URL}/indexes",
+            headers=headers,
+            params={"index_name": TWELVELABS_INDEX_NAME}
+        )
+        if res.status_code != 200:
+            logger.warning("TwelveLabs index lookup failed: %s", res.status_code)
+            return None
+        for index in res.json().get("data") or []:
+            if index.get("index_name") == TWELVELABS_INDEX_NAME:
+                index_id = index.get("_id") or index.get("id")
+                logger.info("Reusing existing TwelveLabs index %s", index_id)
+                return index_id
+    except Exception as e:
+        logger.warning("TwelveLabs index lookup failed: %s", e)
+    return None
+
+
+async def create_index_if_needed():
+    """Auto-create a TwelveLabs index if none exists (cached after first success)."""
+    global _cached_index_id
+
     if not TWELVELABS_API_KEY:
         return "twelvelabs_not_configured"
 
-    if TWELVELABS_INDEX_ID == "auto" or not TWELVELABS_INDEX_ID:
+    if TWELVELABS_INDEX_ID and TWELVELABS_INDEX_ID != "auto":
+        return TWELVELABS_INDEX_ID
+
+    if _cached_index_id:
+        return _cached_index_id
+
+    # Lock so concurrent requests don't each create their own index
+    async with _index_lock:
+        if _cached_index_id:
+            return _cached_index_id
+
+        _cached_index_id = load_cached_index_id()
+        if _cached_index_id:
+            return _cached_index_id
+
+        headers = {"x-api-key": TWELVELABS_API_KEY, "Content-Type": "application/json"}
+
+        # The cache file can be lost (e.g. on redeploy) - reuse the index we created before
+        index_id = await find_index_by_name(headers)
+        if not index_id:
+            try:
+                payload = {
+                    "index_name": TWELVELABS_INDEX_NAME,
+                    "models": [{"model_name": "pegasus1.2", "model_options": ["visual", "audio"]}]
+                }
+                res = await http_client.post(f"{TWELVELABS_API_URL}/indexes", headers=headers, json=payload)
+                logger.info("TwelveLabs index creation: %s", res.status_code)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("TwelveLabs index response: %s", res.text)
+                result = res.json()
+            except Exception as e:
+                return f"error_creating_index: {e}"
+
+            # v1.3 returns the new index as "_id"
+            index_id = result.get("_id") or result.get("id")
+            if not index_id:
+                return "index_creation_failed"
+
+        _cached_index_id = index_id
+        save_cached_index_id(index_id)
+        return index_id
+
+
+def content_public_id(sha256_hex: str) -> str:
+    """Cloudinary public_id for an upload, derived from its SHA-256 content hash."""
+    return f"uploads/{sha256_hex}"
+
+
+def find_existing_upload(public_id: str, resource_type: str):
+    """Return the Cloudinary resource for public_id, or None if it hasn't been uploaded.
+
+    Best effort: the Admin API is rate-limited and needs admin credentials, so any failure
+    is logged and treated as a miss rather than failing the upload.
+    """
+    try:
+        return cloudinary.api.resource(public_id, resource_type=resource_type)
+    except cloudinary.exceptions.NotFound:
+        return None
+    except Exception as e:
+        logger.warning("Cloudinary lookup for %s failed, uploading anyway: %s", public_id, e)
+        return None
+
+
+def upload_deduplicated(upload, file, resource_type: str, **options):
+    """Upload a seekable file under its content hash, reusing an existing asset with the same bytes."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.read(CLOUDINARY_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    file.seek(0)
+
+    public_id = content_public_id(digest.hexdigest())
+    existing = find_existing_upload(public_id, resource_type)
+    if existing:
+        logger.info("Reusing existing Cloudinary upload: %s", public_id)
+        return existing
+    return upload(file, resource_type=resource_type, public_id=public_id, overwrite=False, **options)
+
+
+async def upload_to_cloudinary(video: UploadFile, image: UploadFile):
+    """Upload both video and image to Cloudinary concurrently and return URLs."""
+    # cloudinary.uploader is blocking, so run each upload in a worker thread.
+    # Videos go through the chunked upload, streamed from Starlette's spooled file.
+    video_task = asyncio.to_thread(
+        upload_deduplicated,
+        cloudinary.uploader.upload_large,
+        video.file,
+        "video",
+        chunk_size=CLOUDINARY_CHUNK_SIZE
+    )
+    image_task = asyncio.to_thread(upload_deduplicated, cloudinary.uploader.upload, image.file, "image")
+    video_upload, image_upload = await asyncio.gather(video_task, image_task)
+    return video_upload["secure_url"], image_upload["secure_url"]
+
+
+class CloudinaryChunkedUpload:
+    """Feeds a stream of unknown length to Cloudinary's chunked upload API as it arrives.
+
+    With `sha256` set, the upload is stored under that content hash and the bytes are checked
+    against it before the final chunk goes out, so a wrong hash never creates an asset.
+    """
+
+    def __init__(self, filename: str, resource_type: str, sha256: str = None,
+                 chunk_size: int = CLOUDINARY_CHUNK_SIZE):
+        self.filename = filename or "stream"
+        self.options = {"resource_type": resource_type}
+        self.sha256 = sha256
+        self.digest = hashlib.sha256()
+        if sha256:
+            # overwrite=False: if the asset already exists Cloudinary keeps it and says so
+            self.options.update(public_id=content_public_id(sha256), overwrite=False)
+        self.chunk_size = chunk_size
+        self.upload_id = uuid.uuid4().hex
+        self.buffer = bytearray()
+        self.held = None  # last full chunk, held back until we know whether it's the final one
+        self.offset = 0
+        self.result = None
+
+    async def write(self, data: bytes):
+        self.digest.update(data)
+        self.buffer += data
+        while len(self.buffer) >= self.chunk_size:
+            if self.held is not None:
+                await self._send(self.held, last=False)
+            self.held = bytes(self.buffer[:self.chunk_size])
+            del self.buffer[:self.chunk_size]
+
+    async def close(self):
+        """Send whatever is left as the final chunk and return Cloudinary's upload result."""
+        if self.held is not None and self.buffer:
+            await self._send(self.held, last=False)
+            self.held = None
+        final = self.held if self.held is not None else bytes(self.buffer)
+        if not final:
+            raise ValueError(f"Empty upload: {self.filename}")
+        if self.sha256 and self.digest.hexdigest() != self.sha256:
+            raise ValueError(f"Upload {self.filename} doesn't match its declared SHA-256")
+        await self._send(final, last=True)
+        return self.result
+
+    @property
+    def reused(self) -> bool:
+        """Whether Cloudinary kept an identical existing asset instead of creating one."""
+        return bool(self.result and self.result.get("existing"))
+
+    async def _send(self, chunk: bytes, last: bool):
+        # Total size is only known once the stream ends; earlier chunks use -1
+        total = self.offset + len(chunk) if last else -1
+        http_headers = {
+            "Content-Range": f"bytes {self.offset}-{self.offset + len(chunk) - 1}/{total}",
+            "X-Unique-Upload-Id": self.upload_id
+        }
+        self.result = await asyncio.to_thread(
+            cloudinary.uploader.upload_large_part,
+            (self.filename, chunk),
+            http_headers=http_headers,
+            **self.options
+        )
+        self.options["public_id"] = self.result.get("public_id")
+        self.offset += len(chunk)
+
+
+class ExistingUpload:
+    """Stands in for an upload whose content is already on Cloudinary: the part is drained and
+    hashed (to confirm the declared SHA-256) instead of being sent again."""
+
+    reused = True
+
+    def __init__(self, filename: str, sha256: str, resource: dict):
+        self.filename = filename
+        self.sha256 = sha256
+        self.resource = resource
+        self.digest = hashlib.sha256()
+
+    async def write(self, data: bytes):
+        self.digest.update(data)
+
+    async def close(self):
+        if self.digest.hexdigest() != self.sha256:
+            raise ValueError(f"Upload {self.filename} doesn't match its declared SHA-256")
+        return self.resource
+
+
+async def destroy_uploads(created: list):
+    """Best-effort removal of assets uploaded for a request that was then rejected."""
+    for public_id, resource_type in created:
         try:
-            headers = {"x-api-key": TWELVELABS_API_KEY, "Content-Type": "application/json"}
-            payload = {
-                "index_name": "hackathon_index",
-                "models": [{"model_name": "pegasus1.2", "model_options": ["visual", "audio"]}]
-            }
-            res = requests.post(f"{TWELVELABS_API_URL}/indexes", headers=headers, json=payload)
-            print(f"TwelveLabs index creation: {res.status_code} | {res.text}")
-            result = res.json()
-            return result.get("id", "index_creation_failed")
+            await asyncio.to_thread(cloudinary.uploader.destroy, public_id, resource_type=resource_type)
+            logger.info("Removed orphaned Cloudinary upload: %s", public_id)
         except Exception as e:
-            return f"error_creating_index: {e}"
+            logger.warning("Could not remove orphaned Cloudinary upload %s: %s", public_id, e)
 
-    return TWELVELABS_INDEX_ID
 
+async def start_upload(name: str, filename: str, sha256: str = None):
+    """Pick the target for an incoming file part: reuse an identical asset, or stream a new one."""
+    if sha256 is None:
+        return CloudinaryChunkedUpload(filename, UPLOAD_FIELDS[name])
 
-def upload_to_cloudinary(video: UploadFile, image: UploadFile):
-    """Upload both video and image to Cloudinary and return URLs."""
-    video_upload = cloudinary.uploader.upload(video.file, resource_type="video")
-    image_upload = cloudinary.uploader.upload(image.file, resource_type="image")
-    return video_upload["secure_url"], image_upload["secure_url"]
+    sha256 = sha256.strip().lower()
+    if not SHA256_RE.fullmatch(sha256):
+        raise ValueError(f"Form field '{name}_sha256' must be a hex SHA-256 digest")
+    existing = await asyncio.to_thread(find_existing_upload, content_public_id(sha256), UPLOAD_FIELDS[name])
+    if existing:
+        return ExistingUpload(filename, sha256, existing)
+    return CloudinaryChunkedUpload(filename, UPLOAD_FIELDS[name], sha256=sha256)
+
+
+async def stream_form_to_cloudinary(request: Request, required: tuple = (), non_empty: tuple = ()):
+    """Parse a multipart body as it streams in, sending file parts straight to Cloudinary.
+
+    Returns (uploads, fields): field name -> secure_url for files streamed to Cloudinary,
+    and field name -> str for text fields. Raises ValueError for malformed requests: an
+    UPLOAD_FIELDS name sent as text or more than once, a field in `required` missing, or a
+    blank text field listed in `non_empty` - checked as soon as that field arrives, so send
+    it before the files. On any error, files already uploaded by this request are destroyed.
+
+    A `<name>_sha256` text field sent before file `<name>` enables deduplication: if Cloudinary
+    already has that content the part is only drained and verified, otherwise it's uploaded
+    under the hash so the next submission of the same file can reuse it.
+    """
+    content_type, params = parse_options_header(request.headers.get("Content-Type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise ValueError("Expected a multipart/form-data request")
+
+    # The parser's callbacks are synchronous, so collect events and handle them after each write
+    events = []
+    header_field = bytearray()
+    header_value = bytearray()
+    part_headers = {}
+
+    def on_header_end():
+        part_headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished():
+        events.append(("headers", dict(part_headers)))
+        part_headers.clear()
+
+    parser = multipart.MultipartParser(boundary, {
+        "on_header_field": lambda data, start, end: header_field.extend(data[start:end]),
+        "on_header_value": lambda data, start, end: header_value.extend(data[start:end]),
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": lambda data, start, end: events.append(("data", bytes(data[start:end]))),
+        "on_part_end": lambda: events.append(("end", None)),
+    })
+
+    uploads = {}
+    fields = {}
+    created = []  # (public_id, resource_type) of assets this request put on Cloudinary
+    name, target = None, None
+    try:
+        async for body_chunk in request.stream():
+            parser.write(body_chunk)
+            for kind, value in events:
+                if kind == "headers":
+                    _, disposition = parse_options_header(value.get(b"content-disposition", b""))
+                    name = disposition.get(b"name", b"").decode()
+                    filename = disposition.get(b"filename")
+                    if filename is None:
+                        if name in UPLOAD_FIELDS:
+                            raise ValueError(f"Form field '{name}' must be a file upload")
+                        target = bytearray()
+                    elif name in UPLOAD_FIELDS:
+                        if name in uploads:
+                            raise ValueError(f"Form field '{name}' was sent more than once")
+                        uploads[name] = None  # reserved until the upload finishes
+                        target = await start_upload(name, filename.decode(), fields.get(f"{name}_sha256"))
+                    else:
+                        target = None  # unexpected file field - drain and ignore
+                elif kind == "data":
+                    if isinstance(target, bytearray):
+                        target += value
+                        if len(target) > MAX_TEXT_FIELD_BYTES:
+                            raise ValueError(f"Form field '{name}' is too large")
+                    elif target is not None:
+                        await target.write(value)
+                elif kind == "end":
+                    if isinstance(target, bytearray):
+                        fields[name] = target.decode()
+                        if name in non_empty and not fields[name].strip():
+                            raise ValueError(f"Form field '{name}' must not be empty")
+                    elif target is not None:
+                        result = await target.close()
+                        if not target.reused:
+                            created.append((result["public_id"], UPLOAD_FIELDS[name]))
+                        uploads[name] = result["secure_url"]
+                        logger.info("%s %s on Cloudinary: %s", "Reused" if target.reused else "Streamed",
+                                    name, uploads[name])
+                    name, target = None, None
+            events.clear()
+        parser.finalize()
+
+        missing = [f for f in required if not uploads.get(f) and f not in fields]
+        if missing:
+            raise ValueError(f"Missing form fields: {', '.join(missing)}")
+    except BaseException:
+        # Don't leave orphaned assets behind on a rejected or aborted request
+        await destroy_uploads(created)
+        raise
+
+    return uploads, fields
+
+async def fetch_description_endpoint(video_id: str, headers: dict):
+    """Ask the /videos/{id}/description endpoint for a description."""
+    try:
+        desc_resp = await http_client.get(
+            f"{TWELVELABS_API_URL}/videos/{video_id}/description",
+            headers=headers,
+            timeout=30
+        )
+        logger.debug("Description endpoint status: %s", desc_resp.status_code)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Description endpoint response: %s", desc_resp.text)
+        
+        if desc_resp.status_code == 200:
+            desc_data = desc_resp.json()
+            return desc_data.get("description") or desc_data.get("summary")
+    except Exception as e:
+        logger.warning("Error calling description endpoint: %s", e)
+    return None
+
+
+async def fetch_summarize_endpoint(video_id: str, headers: dict):
+    """Ask the /summarize endpoint (newer API) for a summary."""
+    try:
+        summarize_resp = await http_client.post(
+            f"{TWELVELABS_API_URL}/summarize",
+            headers=headers,
+            json={"video_id": video_id, "type": "summary"},
+            timeout=30
+        )
+        logger.debug("Summarize endpoint status: %s", summarize_resp.status_code)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Summarize response: %s", summarize_resp.text)
+        
+        if summarize_resp.status_code == 200:
+            summarize_data = summarize_resp.json()
+            return summarize_data.get("summary") or summarize_data.get("description")
+    except Exception as e:
+        logger.warning("Error calling summarize endpoint: %s", e)
+    return None
+
+
+async def fetch_video_details_endpoint(video_id: str, headers: dict):
+    """Look for a description in the /videos/{id} details."""
+    try:
+        video_resp = await http_client.get(
+            f"{TWELVELABS_API_URL}/videos/{video_id}",
+            headers=headers,
+            timeout=30
+        )
+        logger.debug("Video details endpoint status: %s", video_resp.status_code)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Video details response: %s", video_resp.text)
+        
+        if video_resp.status_code == 200:
+            video_data = video_resp.json()
+            return (
+                video_data.get("description") or 
+                video_data.get("summary") or 
+                video_data.get("metadata", {}).get("description")
+            )
+    except Exception as e:
+        logger.warning("Error calling video details endpoint: %s", e)
+    return None
 
-def analyze_with_twelvelabs(video_url: str, index_id: str):
+
+async def fetch_first_description(video_id: str, headers: dict):
+    """Query all description endpoints concurrently and return the first non-empty result."""
+    pending = {
+        asyncio.create_task(fetch_description_endpoint(video_id, headers)),
+        asyncio.create_task(fetch_summarize_endpoint(video_id, headers)),
+        asyncio.create_task(fetch_video_details_endpoint(video_id, headers)),
+    }
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                description = task.result()
+                if description:
+                    return description
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def analyze_with_twelvelabs(video_url: str, index_id: str):
     """Send video to TwelveLabs and get its description."""
     if not TWELVELABS_API_KEY or "error" in index_id:
         return {"error": f"TwelveLabs not configured or index error: {index_id}"}
 
     headers = {"x-api-key": TWELVELABS_API_KEY}
-    # Don't set Content-Type - requests will set it automatically when using files parameter
+    # Don't set Content-Type - httpx will set it automatically when using files parameter
 
     try:
         # Step 1: Upload video to index using multipart/form-data (required by TwelveLabs)
@@ -78,111 +649,71 @@ def analyze_with_twelvelabs(video_url: str, index_id: str):
             "index_id": (None, index_id),
             "video_url": (None, video_url)
         }
-        task_resp = requests.post(f"{TWELVELABS_API_URL}/tasks", headers=headers, files=files)
-        print(f"TwelveLabs task response: {task_resp.status_code}")
-        print(f"Task response body: {task_resp.text}")
+        task_resp = await http_client.post(f"{TWELVELABS_API_URL}/tasks", headers=headers, files=files)
+        logger.info("TwelveLabs task response: %s", task_resp.status_code)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Task response body: %s", task_resp.text)
         
         task_result = task_resp.json()
+        if is_unknown_index_error(task_resp.status_code, task_result):
+            forget_cached_index_id(index_id)
+            return {"error": f"TwelveLabs index {index_id} not found, a new one will be created on retry: {task_result}"}
         
         # Extract task_id - TwelveLabs returns it as "_id", "id", or "task_id"
         task_id = task_result.get("_id") or task_result.get("id") or task_result.get("task_id")
         if not task_id:
             return {"error": f"No task_id returned: {task_result}"}
 
-        print(f"TwelveLabs returned task_id: {task_id}")
+        logger.info("TwelveLabs returned task_id: %s", task_id)
+        task_update = watch_webhook(task_id)
 
-        # Step 2: Poll task status until completion
-        max_retries = 60  # Increased to 60 retries
-        retry_count = 0
+        # Step 2: Poll task status until completion (10 minute budget)
+        deadline = time.monotonic() + 600
+        attempt = 0
         status_data = None
+        current_status = None
+        etag = None
+        task_ready = False
         
-        while retry_count < max_retries:
-            status_resp = requests.get(f"{TWELVELABS_API_URL}/tasks/{task_id}", headers=headers)
-            status_data = status_resp.json()
-            current_status = status_data.get("status")
-            print(f"Task status check {retry_count + 1}/{max_retries}: {current_status}")
-            print(f"Full status response: {status_data}")
-            
-            if current_status == "ready":
-                print("Task is ready!")
-                break
-            elif current_status == "failed":
-                return {"error": f"Task failed: {status_data}"}
-            elif current_status in ["queued", "indexing", "pending"]:
-                # Still processing, continue polling
-                pass
+        while time.monotonic() < deadline:
+            poll_headers = {**headers, "If-None-Match": etag} if etag else headers
+            status_resp = await http_client.get(f"{TWELVELABS_API_URL}/tasks/{task_id}", headers=poll_headers)
+            if status_resp.status_code == 429 or status_resp.status_code >= 500:
+                logger.warning("Task status check %d: HTTP %s, backing off", attempt + 1, status_resp.status_code)
+            elif status_resp.status_code == 304:
+                logger.debug("Task status check %d: unchanged (%s)", attempt + 1, current_status)
+            else:
+                etag = status_resp.headers.get("ETag")
+                current_status = peek_status(status_resp.content)
+                if current_status not in TASK_PENDING_STATUSES:
+                    # Finished (or unrecognised) - only now pay for the full parse
+                    status_data = status_resp.json()
+                    current_status = status_data.get("status")
+                    logger.debug("Full status response: %s", status_data)
+                logger.debug("Task status check %d: %s", attempt + 1, current_status)
+                
+                if current_status == "ready":
+                    logger.info("Task is ready!")
+                    task_ready = True
+                    break
+                elif current_status == "failed":
+                    return {"error": f"Task failed: {status_data}"}
             
-            time.sleep(10)  # Wait 10 seconds between checks
-            retry_count += 1
+            await wait_for_webhook(task_update, poll_delay(attempt, status_resp))
+            attempt += 1
 
-        if retry_count >= max_retries:
-            return {"error": f"Video processing timeout - task did not complete in time. Last status: {status_data}"}
+        if not task_ready:
+            return {"error": f"Video processing timeout - task did not complete in time. Last status: {current_status}"}
 
         # Step 3: Extract video_id from the completed task
         video_id = status_data.get("video_id") or task_id
         if not video_id:
             return {"error": f"No video_id in completed task: {status_data}"}
 
-        print(f"Video ID extracted: {video_id}")
+        logger.info("Video ID extracted: %s", video_id)
 
-        # Step 4: Get video description - try multiple endpoints
-        description = None
-        
-        # Try the /description endpoint first
-        try:
-            desc_resp = requests.get(
-                f"{TWELVELABS_API_URL}/videos/{video_id}/description",
-                headers=headers,
-                timeout=30
-            )
-            print(f"Description endpoint status: {desc_resp.status_code}")
-            print(f"Description endpoint response: {desc_resp.text}")
-            
-            if desc_resp.status_code == 200:
-                desc_data = desc_resp.json()
-                description = desc_data.get("description") or desc_data.get("summary")
-        except Exception as e:
-            print(f"Error calling description endpoint: {e}")
-        
-        # If that didn't work, try the summarize endpoint (newer API)
-        if not description:
-            try:
-                print(f"Trying summarize endpoint for video {video_id}...")
-                summarize_resp = requests.post(
-                    f"{TWELVELABS_API_URL}/summarize",
-                    headers=headers,
-                    json={"video_id": video_id, "type": "summary"},
-                    timeout=30
-                )
-                print(f"Summarize endpoint status: {summarize_resp.status_code}")
-                print(f"Summarize response: {summarize_resp.text}")
-                
-                if summarize_resp.status_code == 200:
-                    summarize_data = summarize_resp.json()
-                    description = summarize_data.get("summary") or summarize_data.get("description")
-            except Exception as e:
-                print(f"Error calling summarize endpoint: {e}")
-        
-        # If that didn't work, try getting video details
-        if not description:
-            try:
-                video_resp = requests.get(
-                    f"{TWELVELABS_API_URL}/videos/{video_id}",
-                    headers=headers,
-                    timeout=30
-                )
-                print(f"Video details endpoint status: {video_resp.status_code}")
-                print(f"Video details response: {video_resp.text}")
-                
-                if video_resp.status_code == 200:
-                    video_data = video_resp.json()
-                    description = (
-                        video_data.get("description") or 
-                        video_data.get("summary") or 
-                        video_data.get("metadata", {}).get("description")
-                    )
-            except Exception as e:
-                print(f"Error calling video details endpoint: {e}")
+        # Step 4: Get video description - query all endpoints at once, take the first hit
+        description = await fetch_first_description(video_id, headers)
         
         # If still no description, check the task response itself
         if not description and status_data:
@@ -193,7 +724,7 @@ def analyze_with_twelvelabs(video_url: str, index_id: str):
             )
         
         if not description:
-            print("WARNING: No description found from any endpoint")
+            logger.warning("No description found from any endpoint")
             description = "Video processed but description unavailable"
 
         return {
@@ -203,14 +734,12 @@ def analyze_with_twelvelabs(video_url: str, index_id: str):
         }
 
     except Exception as e:
-        print(f"Exception in analyze_with_twelvelabs: {str(e)}")
+        logger.exception("Exception in analyze_with_twelvelabs: %s", e)
         return {"error": f"TwelveLabs API error: {str(e)}"}
-def generate_prompt_with_gpt(video_description: str, user_text: str):
-    """Generate creative text prompt for Higgsfield using GPT."""
-    if not OPENAI_API_KEY:
-        return "OpenAI API key not configured."
 
-    prompt_text = f"""
+
+# Prompt sent to GPT; filled in with str.format
+_PROMPT_TMPL = """
 You are a creative AI prompt engineer. Using the following video description and user's thing,
 generate a short, cinematic and vivid text prompt for AI video generation.
 
@@ -223,34 +752,97 @@ Write a single detailed prompt that replaces the thing in the video with the use
 Focus on visuals, motion, color, and emotion. Keep it concise, vivid, and imaginative.
 """
 
+# sha256(description, user_text) -> GPT prompt, least recently used first
+_gpt_cache = OrderedDict()
+
+
+def gpt_cache_key(video_description: str, user_text: str) -> str:
+    return hashlib.sha256(f"{video_description}\x00{user_text}".encode()).hexdigest()
+
+
+async def generate_prompt_with_gpt(video_description: str, user_text: str):
+    """Generate creative text prompt for Higgsfield using GPT (cached per description + idea)."""
+    if not OPENAI_API_KEY:
+        return "OpenAI API key not configured."
+
+    video_description = video_description[:GPT_MAX_DESCRIPTION_CHARS]
+    cache_key = gpt_cache_key(video_description, user_text)
+    if cache_key in _gpt_cache:
+        logger.debug("GPT prompt cache hit")
+        _gpt_cache.move_to_end(cache_key)
+        return _gpt_cache[cache_key]
+
+    prompt_text = _PROMPT_TMPL.format(user_text=user_text, video_description=video_description)
+
     headers = {
         "Authorization": f"Bearer {OPENAI_API_KEY}",
         "Content-Type": "application/json"
     }
     data = {
-        "model": "gpt-4o-mini",
+        "model": OPENAI_MODEL,
         "messages": [{"role": "user", "content": prompt_text}],
-        "max_tokens": 250
+        "max_tokens": OPENAI_MAX_TOKENS
     }
 
     try:
-        response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=data)
+        response = await http_client.post("https://api.openai.com/v1/chat/completions", headers=headers, json=data)
         result = response.json()
-        return result["choices"][0]["message"]["content"]
+        gpt_prompt = result["choices"][0]["message"]["content"]
     except Exception as e:
         return f"Error calling GPT API: {e}"
 
+    # Only successful responses are cached
+    _gpt_cache[cache_key] = gpt_prompt
+    if len(_gpt_cache) > GPT_CACHE_SIZE:
+        _gpt_cache.popitem(last=False)
+    return gpt_prompt
 
-def generate_with_higgsfield(prompt: str, image_url: str):
-    """Generate video using Higgsfield with correct headers and payload."""
-    
-    HIGGSFIELD_API_SECRET = os.getenv("HIGGSFIELD_API_SECRET")
+
+async def wait_for_higgsfield_job(job_set_id: str, headers: dict, job_update: asyncio.Event):
+    """Poll a Higgsfield job set until it's final or failed and return its status payload.
+
+    Runs until done - bound it with asyncio.wait_for. Polls follow HIGGSFIELD_POLL_INTERVALS,
+    and a Higgsfield webhook for this job set cuts the current wait short.
+    """
+    status_endpoint = f"{HIGGSFIELD_API_URL}/v1/job-sets/{job_set_id}"
+    poll_count = 0
     
+    while True:
+        status_resp = None
+        try:
+            status_resp = await http_client.get(status_endpoint, headers=headers, timeout=30)
+            logger.debug("Poll %d: %s", poll_count + 1, status_resp.status_code)
+            
+            if status_resp.status_code == 200:
+                status_data = status_resp.json()
+                logger.debug("Status: %s", status_data)
+                
+                # Check if job is complete (or has failed)
+                if status_data.get("is_final") or status_data.get("status") in ["completed", "success", "failed", "error"]:
+                    return status_data
+                
+                logger.debug("Still processing, status: %s", status_data.get("status"))
+            
+            elif status_resp.status_code == 404:
+                logger.debug("Job not found yet, retrying...")
+            
+            else:
+                logger.warning("Unexpected status code: %s", status_resp.status_code)
+                
+        except Exception as e:
+            logger.warning("Poll exception: %s", e)
+        
+        await wait_for_webhook(job_update, poll_delay(poll_count, status_resp, HIGGSFIELD_POLL_INTERVALS))
+        poll_count += 1
+
+
+async def generate_with_higgsfield(prompt: str, image_url: str):
+    """Generate video using Higgsfield with correct headers and payload."""
     if not HIGGSFIELD_API_KEY or not HIGGSFIELD_API_SECRET:
         return {"error": "HIGGSFIELD_API_KEY or HIGGSFIELD_API_SECRET not configured"}
 
     try:
-        print(f"Submitting to Higgsfield: {prompt[:100]}...")
+        logger.info("Submitting to Higgsfield: %.100s...", prompt)
         
         # CORRECT HEADERS - must use hf-api-key and hf-secret
         headers = {
@@ -259,9 +851,8 @@ def generate_with_higgsfield(prompt: str, image_url: str):
             "Content-Type": "application/json"
         }
         
-        print(f"API Key set: {bool(HIGGSFIELD_API_KEY)}")
-        print(f"API Secret set: {bool(HIGGSFIELD_API_SECRET)}")
-        print(f"Headers being sent: {headers}")
+        logger.debug("API Key set: %s", bool(HIGGSFIELD_API_KEY))
+        logger.debug("API Secret set: %s", bool(HIGGSFIELD_API_SECRET))
         
         # CORRECT PAYLOAD STRUCTURE - params wrapper required
         data = {
@@ -276,15 +867,19 @@ def generate_with_higgsfield(prompt: str, image_url: str):
         if image_url:
             data["params"]["image_url"] = image_url
         
-        print(f"Payload: {data}")
+        if webhook_url("higgsfield"):
+            data["webhook"] = {"url": webhook_url("higgsfield")}
         
-        endpoint = "https://platform.higgsfield.ai/generate/minimax-t2v"
-        print(f"Endpoint: {endpoint}")
+        logger.debug("Payload: %s", data)
         
-        resp = requests.post(endpoint, headers=headers, json=data, timeout=60)
+        endpoint = f"{HIGGSFIELD_API_URL}/generate/minimax-t2v"
+        logger.debug("Endpoint: %s", endpoint)
         
-        print(f"Response status: {resp.status_code}")
-        print(f"Response: {resp.text[:1000]}")
+        resp = await http_client.post(endpoint, headers=headers, json=data, timeout=60)
+        
+        logger.info("Response status: %s", resp.status_code)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Response: %.1000s", resp.text)
         
         if resp.status_code not in [200, 201]:
             return {"error": f"Higgsfield API error: {resp.status_code} - {resp.text}"}
@@ -300,173 +895,267 @@ def generate_with_higgsfield(prompt: str, image_url: str):
         # Get job_set_id from response - this is what we poll
         job_set_id = result.get("job_set_id") or result.get("id") or result.get("uuid")
         if not job_set_id:
-            print(f"Full response to debug: {result}")
+            logger.debug("Full response to debug: %s", result)
             # Sometimes the ID might be nested or named differently
             if isinstance(result, dict):
                 # Try to find any ID-like field
                 for key, value in result.items():
                     if "id" in key.lower() and isinstance(value, str):
                         job_set_id = value
-                        print(f"Found ID in field '{key}': {value}")
+                        logger.debug("Found ID in field '%s': %s", key, value)
                         break
         
         if not job_set_id:
-            print(f"No job_set_id in response: {result}")
+            logger.warning("No job_set_id in response: %s", result)
             return {"error": f"No job_set_id in response: {result}"}
         
-        print(f"Generation started with job_set_id: {job_set_id}")
+        logger.info("Generation started with job_set_id: %s", job_set_id)
+        job_update = watch_webhook(job_set_id)
         
-        # Poll for completion and get the video URL
-        max_polls = 240  # 20 minutes with 5 second intervals
-        poll_interval = 5
+        # Wait for completion (20 minute budget), then fetch the video
+        try:
+            status_data = await asyncio.wait_for(
+                wait_for_higgsfield_job(job_set_id, headers, job_update),
+                timeout=HIGGSFIELD_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            return {"error": "Video generation timeout - please check Higgsfield dashboard"}
         
-        for poll_count in range(max_polls):
-            try:
-                # Poll the job status
-                status_endpoint = f"https://platform.higgsfield.ai/v1/job-sets/{job_set_id}"
-                status_resp = requests.get(status_endpoint, headers=headers, timeout=30)
-                
-                print(f"Poll {poll_count + 1}: {status_resp.status_code}")
-                
-                if status_resp.status_code == 200:
-                    status_data = status_resp.json()
-                    print(f"Status: {status_data}")
-                    
-                    # Check if job is complete
-                    if status_data.get("is_final") or status_data.get("status") in ["completed", "success"]:
-                        # Extract video URL from response
-                        video_url = None
-                        
-                        # Try different possible locations for the URL
-                        if "jobs" in status_data and len(status_data["jobs"]) > 0:
-                            job = status_data["jobs"][0]
-                            video_url = job.get("result_url") or job.get("video_url") or job.get("url")
-                        
-                        if not video_url:
-                            video_url = (
-                                status_data.get("video_url") or 
-                                status_data.get("result_url") or
-                                status_data.get("url")
-                            )
-                        
-                        if video_url:
-                            print(f"Video URL found: {video_url}")
-                            
-                            # Download the video from Higgsfield
-                            print(f"Downloading video from Higgsfield...")
-                            video_resp = requests.get(video_url, timeout=60)
-                            
-                            if video_resp.status_code == 200:
-                                # Upload to Cloudinary
-                                print(f"Uploading video to Cloudinary...")
-                                from io import BytesIO
-                                video_file = BytesIO(video_resp.content)
-                                
-                                cloudinary_result = cloudinary.uploader.upload(
-                                    video_file,
-                                    resource_type="video",
-                                    folder="generated_videos"
-                                )
-                                
-                                cloudinary_url = cloudinary_result["secure_url"]
-                                print(f"Video uploaded to Cloudinary: {cloudinary_url}")
-                                
-                                return {
-                                    "video_url": cloudinary_url,
-                                    "status": "success",
-                                    "message": "Video generated and uploaded successfully"
-                                }
-                            else:
-                                print(f"Failed to download video: {video_resp.status_code}")
-                                return {"error": f"Failed to download video from Higgsfield"}
-                        else:
-                            print(f"Job completed but no video URL found in response: {status_data}")
-                            return {"error": f"Video generated but URL not found in response"}
-                    
-                    elif status_data.get("status") in ["failed", "error"]:
-                        error_msg = status_data.get("error_message") or status_data.get("error")
-                        return {"error": f"Video generation failed: {error_msg}"}
-                    
-                    else:
-                        print(f"Still processing, status: {status_data.get('status')}")
-                        time.sleep(poll_interval)
-                        continue
-                
-                elif status_resp.status_code == 404:
-                    print(f"Job not found yet, retrying...")
-                    time.sleep(poll_interval)
-                    continue
-                
-                else:
-                    print(f"Unexpected status code: {status_resp.status_code}")
-                    time.sleep(poll_interval)
-                    continue
-                    
-            except Exception as e:
-                print(f"Poll exception: {e}")
-                time.sleep(poll_interval)
-                continue
+        if status_data.get("status") in ["failed", "error"]:
+            error_msg = status_data.get("error_message") or status_data.get("error")
+            return {"error": f"Video generation failed: {error_msg}"}
+        
+        # Extract video URL from response
+        video_url = None
+        
+        # Try different possible locations for the URL
+        if "jobs" in status_data and len(status_data["jobs"]) > 0:
+            job = status_data["jobs"][0]
+            video_url = job.get("result_url") or job.get("video_url") or job.get("url")
+        
+        if not video_url:
+            video_url = (
+                status_data.get("video_url") or 
+                status_data.get("result_url") or
+                status_data.get("url")
+            )
+        
+        if not video_url:
+            logger.warning("Job completed but no video URL found in response: %s", status_data)
+            return {"error": f"Video generated but URL not found in response"}
+        
+        logger.info("Video URL found: %s", video_url)
         
-        return {"error": "Video generation timeout - please check Higgsfield dashboard"}
+        # Download the video from Higgsfield, streaming it to a temp file
+        logger.info("Downloading video from Higgsfield...")
+        with tempfile.TemporaryFile() as video_file:
+            async with http_client.stream("GET", video_url, timeout=60) as video_resp:
+                if video_resp.status_code != 200:
+                    logger.warning("Failed to download video: %s", video_resp.status_code)
+                    return {"error": f"Failed to download video from Higgsfield"}
+                async for chunk in video_resp.aiter_bytes(CLOUDINARY_CHUNK_SIZE):
+                    video_file.write(chunk)
+            video_file.seek(0)
+            
+            # Upload to Cloudinary
+            logger.info("Uploading video to Cloudinary...")
+            cloudinary_result = await asyncio.to_thread(
+                cloudinary.uploader.upload_large,
+                video_file,
+                resource_type="video",
+                folder="generated_videos",
+                chunk_size=CLOUDINARY_CHUNK_SIZE
+            )
+        
+        cloudinary_url = cloudinary_result["secure_url"]
+        logger.info("Video uploaded to Cloudinary: %s", cloudinary_url)
+        
+        return {
+            "video_url": cloudinary_url,
+            "status": "success",
+            "message": "Video generated and uploaded successfully"
+        }
     
     except Exception as e:
-        print(f"Exception: {str(e)}")
+        logger.exception("Higgsfield exception: %s", e)
         return {"error": f"Higgsfield API error: {str(e)}"}
-@app.post("/process_ai/")
-async def process_ai(video: UploadFile, image: UploadFile, text: str = Form(...)):
-    """Main pipeline: upload -> describe -> generate prompt -> video."""
+
+
+def webhook_task_id(payload: dict):
+    """Pull the task/job id out of a provider callback body."""
+    data = payload.get("data") if isinstance(payload.get("data"), dict) else {}
+    return (
+        data.get("id") or data.get("task_id") or data.get("job_set_id") or
+        payload.get("task_id") or payload.get("job_set_id") or payload.get("id")
+    )
+
+
+async def handle_webhook(provider: str, request: Request):
+    """Wake the poller waiting on this task; it re-fetches status itself, so the body isn't trusted."""
     try:
-        # 1️⃣ Upload video and image
-        video_url, image_url = upload_to_cloudinary(video, image)
-        print(f"Uploaded video: {video_url}")
-        print(f"Uploaded image: {image_url}")
-
-        # 2️⃣ Create TwelveLabs index
-        index_id = create_index_if_needed()
-        print(f"Using index_id: {index_id}")
-
-        # 3️⃣ Analyze via TwelveLabs (get description)
-        analysis = analyze_with_twelvelabs(video_url, index_id)
-        if "error" in analysis:
-            return {
-                "status": "error",
-                "message": f"Video analysis failed: {analysis['error']}",
-                "original_video": video_url,
-                "image_used": image_url
-            }
+        payload = await request.json()
+    except Exception:
+        return {"status": "ignored"}
+
+    task_id = webhook_task_id(payload) if isinstance(payload, dict) else None
+    event = _webhook_events.get(task_id) if task_id else None
+    logger.info("%s webhook for %s (waiting: %s)", provider, task_id, event is not None)
+    if event is None:
+        return {"status": "ignored"}
+
+    event.set()
+    return {"status": "ok"}
+
+
+@app.post("/webhook/twelvelabs")
+async def twelvelabs_webhook(request: Request):
+    """TwelveLabs task completion callback."""
+    return await handle_webhook("twelvelabs", request)
+
+
+@app.post("/webhook/higgsfield")
+async def higgsfield_webhook(request: Request):
+    """Higgsfield job-set completion callback."""
+    return await handle_webhook("higgsfield", request)
+
+
+# ------------------- JOBS -------------------
+
+# job_id -> job record. Kept in-process (webhooks wake pollers in this process too),
+# so run the API as a single worker.
+jobs = {}
+_job_tasks = set()  # strong refs so running pipelines aren't garbage collected
+JOB_TTL = 3600  # finished jobs are forgotten after an hour
 
-        description = analysis.get("description", "No description available")
-        print(f"Video description: {description}")
-
-        # 4️⃣ Generate GPT prompt
-        gpt_prompt = generate_prompt_with_gpt(description, text)
-        print(f"Generated prompt: {gpt_prompt[:100]}...")
-
-        # 5️⃣ Generate with Higgsfield
-        print("Starting Higgsfield video generation...")
-        gen_result = generate_with_higgsfield(gpt_prompt, image_url)
-        
-        if "error" in gen_result:
-            return {
-                "status": "partial_success",
-                "message": f"Video generation failed: {gen_result['error']}",
-                "original_video": video_url,
-                "image_used": image_url,
-                "description": description,
-                "final_prompt": gpt_prompt,
-                "generated_video": None
-            }
 
-        # 6️⃣ Success
+async def run_pipeline(video_url: str, image_url: str, index_id: str, text: str):
+    """Pipeline after upload: describe -> generate prompt -> video."""
+    # 3️⃣ Analyze via TwelveLabs (get description)
+    analysis = await analyze_with_twelvelabs(video_url, index_id)
+    if "error" in analysis:
         return {
-            "status": "success",
+            "status": "error",
+            "message": f"Video analysis failed: {analysis['error']}",
+            "original_video": video_url,
+            "image_used": image_url
+        }
+
+    description = analysis.get("description", "No description available")
+    logger.debug("Video description: %s", description)
+
+    # 4️⃣ Generate GPT prompt
+    gpt_prompt = await generate_prompt_with_gpt(description, text)
+    logger.debug("Generated prompt: %.100s...", gpt_prompt)
+
+    # 5️⃣ Generate with Higgsfield
+    logger.info("Starting Higgsfield video generation...")
+    gen_result = await generate_with_higgsfield(gpt_prompt, image_url)
+    
+    if "error" in gen_result:
+        return {
+            "status": "partial_success",
+            "message": f"Video generation failed: {gen_result['error']}",
             "original_video": video_url,
             "image_used": image_url,
             "description": description,
             "final_prompt": gpt_prompt,
-            "generated_video": gen_result.get("video_url")
+            "generated_video": None
         }
 
+    # 6️⃣ Success
+    return {
+        "status": "success",
+        "original_video": video_url,
+        "image_used": image_url,
+        "description": description,
+        "final_prompt": gpt_prompt,
+        "generated_video": gen_result.get("video_url")
+    }
+
+
+async def run_job(job_id: str, video_url: str, image_url: str, index_id: str, text: str):
+    """Run the pipeline for a job and store its result."""
+    jobs[job_id]["status"] = "processing"
+    try:
+        result = await run_pipeline(video_url, image_url, index_id, text)
+    except Exception as e:
+        logger.exception("Pipeline error: %s", e)
+        result = {"status": "error", "message": str(e)}
+
+    jobs[job_id] = {"job_id": job_id, **result}
+    asyncio.get_running_loop().call_later(JOB_TTL, jobs.pop, job_id, None)
+
+
+@app.post("/process/")
+async def process(video: UploadFile, image: UploadFile):
+    """Upload video and image to Cloudinary and return their URLs (no AI pipeline)."""
+    try:
+        video_url, image_url = await upload_to_cloudinary(video, image)
     except Exception as e:
-        print(f"Pipeline error: {str(e)}")
-        return {"status": "error", "message": str(e)}
\ No newline at end of file
+        logger.exception("Upload error: %s", e)
+        return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
+
+    return {"status": "success", "video_url": video_url, "image_url": image_url}
+
+
+@app.post("/process_ai/", status_code=202)
+async def process_ai(request: Request):
+    """Stream the media to Cloudinary, then run the pipeline in the background and return a job id.
+
+    Expects multipart/form-data with `video` and `image` files and a `text` field, optionally
+    preceded by `video_sha256` / `image_sha256` so resubmitted files aren't uploaded again. The
+    body is read from request.stream() rather than UploadFile so nothing is spooled to /tmp first.
+    """
+    # 0️⃣ Fail fast before any bytes are uploaded
+    missing_settings = [key for key, value in REQUIRED_SETTINGS.items() if not value]
+    if missing_settings:
+        logger.error("Missing configuration: %s", ", ".join(missing_settings))
+        return JSONResponse(
+            status_code=503,
+            content={"status": "error", "message": f"Server not configured: missing {', '.join(missing_settings)}"}
+        )
+
+    # 2️⃣ Create TwelveLabs index while the upload is still streaming in
+    index_task = asyncio.create_task(create_index_if_needed())
+    try:
+        # 1️⃣ Stream video and image to Cloudinary
+        uploads, fields = await stream_form_to_cloudinary(
+            request,
+            required=("text", "video", "image"),
+            non_empty=("text",)
+        )
+        video_url, image_url, text = uploads["video"], uploads["image"], fields["text"]
+
+        index_id = await index_task
+        logger.info("Uploaded video: %s", video_url)
+        logger.info("Uploaded image: %s", image_url)
+        logger.info("Using index_id: %s", index_id)
+    except ValueError as e:
+        index_task.cancel()
+        return JSONResponse(status_code=400, content={"status": "error", "message": str(e)})
+    except Exception as e:
+        index_task.cancel()
+        logger.exception("Upload error: %s", e)
+        return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
+
+    job_id = uuid.uuid4().hex
+    jobs[job_id] = {
+        "job_id": job_id,
+        "status": "queued",
+        "original_video": video_url,
+        "image_used": image_url
+    }
+    task = asyncio.create_task(run_job(job_id, video_url, image_url, index_id, text))
+    _job_tasks.add(task)
+    task.add_done_callback(_job_tasks.discard)
+
+    return jobs[job_id]
+
+
+@app.get("/process_ai/{job_id}")
+async def process_ai_status(job_id: str):
+    """Current status of a pipeline job (final result once it's done)."""
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": f"Unknown job_id: {job_id}"})
+    return job
@@ -2,6 +2,14 @@
 
 import { useState } from "react";
 
+// Hex SHA-256 of a file, sent ahead of it so the backend can skip re-uploading known content
+async function sha256Hex(file: File): Promise<string> {
+  const digest = await crypto.subtle.digest("SHA-256", await file.arrayBuffer());
+  return Array.from(new Uint8Array(digest))
+    .map((b) => b.toString(16).padStart(2, "0"))
+    .join("");
+}
+
 export default function Home() {
   const [video, setVideo] = useState<File | null>(null);
   const [image, setImage] = useState<File | null>(null);
@@ -17,19 +25,31 @@ export default function Home() {
       return;
     }
 
-    const formData = new FormData();
-    formData.append("video", video);
-    formData.append("image", image);
-    formData.append("text", text);
-
     setLoading(true);
     try {
+      // Text and hashes go first so the backend can reject a bad request, or reuse
+      // already-uploaded files, before the upload streams in
+      const formData = new FormData();
+      formData.append("text", text);
+      formData.append("video_sha256", await sha256Hex(video));
+      formData.append("image_sha256", await sha256Hex(image));
+      formData.append("video", video);
+      formData.append("image", image);
+
       const res = await fetch("http://localhost:8001/process_ai/", {
         method: "POST",
         body: formData,
       });      
-      const data = await res.json();
+      let data = await res.json();
       setResponse(data);
+
+      // The pipeline runs in the background - poll the job until it finishes
+      while (data.job_id && (data.status === "queued" || data.status === "processing")) {
+        await new Promise((resolve) => setTimeout(resolve, 5000));
+        const statusRes = await fetch(`http://localhost:8001/process_ai/${data.job_id}`);
+        data = await statusRes.json();
+        setResponse(data);
+      }
     } catch (error) {
       console.error(error);
       alert("Something went wrong. Check your backend connection.");